@@ -6,18 +6,27 @@ import urllib.parse
 import time
 import os
 import requests
+from requests.adapters import HTTPAdapter
 import base64
+import functools
 from io import BytesIO
 import websocket
 import uuid
-import tempfile
+import shutil
 import socket
+import threading
 import traceback
+from concurrent.futures import ThreadPoolExecutor
+import boto3
+from boto3.s3.transfer import TransferConfig
+from botocore.config import Config
 
 # Time to wait between API check attempts in milliseconds
 COMFY_API_AVAILABLE_INTERVAL_MS = 50
 # Maximum number of API check attempts
 COMFY_API_AVAILABLE_MAX_RETRIES = 500
+# Skip the API check if ComfyUI answered within this many seconds (warm worker)
+COMFY_REACHABLE_CACHE_S = 30
 # Websocket reconnection behaviour (can be overridden through environment variables)
 # NOTE: more attempts and diagnostics improve debuggability whenever ComfyUI crashes mid-job.
 #   • WEBSOCKET_RECONNECT_ATTEMPTS sets how many times we will try to reconnect.
@@ -26,6 +35,14 @@ COMFY_API_AVAILABLE_MAX_RETRIES = 500
 # If the respective env-vars are not supplied we fall back to sensible defaults ("5" and "3").
 WEBSOCKET_RECONNECT_ATTEMPTS = int(os.environ.get("WEBSOCKET_RECONNECT_ATTEMPTS", 5))
 WEBSOCKET_RECONNECT_DELAY_S = int(os.environ.get("WEBSOCKET_RECONNECT_DELAY_S", 3))
+# HTTP /history polling is only used as a fallback when the websocket cannot be
+# re-established while ComfyUI itself is still reachable.
+# The delay between polls starts short to notice quick workflows finishing and
+# grows by COMFY_POLLING_BACKOFF_FACTOR up to the max for long running ones.
+COMFY_POLLING_INITIAL_INTERVAL_MS = 50
+COMFY_POLLING_MAX_INTERVAL_MS = 2000
+COMFY_POLLING_BACKOFF_FACTOR = 1.3
+COMFY_POLLING_TIMEOUT_S = int(os.environ.get("COMFY_POLLING_TIMEOUT_S", 1800))
 
 # Extra verbose websocket trace logs (set WEBSOCKET_TRACE=true to enable)
 if os.environ.get("WEBSOCKET_TRACE", "false").lower() == "true":
@@ -35,9 +52,73 @@ if os.environ.get("WEBSOCKET_TRACE", "false").lower() == "true":
 
 # Host where ComfyUI is running
 COMFY_HOST = "127.0.0.1:8188"
+# Directory with the workflows bundled into the image (see Dockerfile)
+COMFY_WORKFLOWS_DIR = os.environ.get("COMFY_WORKFLOWS_DIR", "/comfyui/workflows")
+# Input directory of ComfyUI, start.sh points it at tmpfs (/dev/shm)
+COMFY_INPUT_DIR = os.environ.get("COMFY_INPUT_DIR", "/comfyui/input")
+# Output directory of ComfyUI, which runs in the same container (see start.sh)
+COMFY_OUTPUT_DIR = os.environ.get("COMFY_OUTPUT_DIR", "/comfyui/output")
+# Parameters that can be set through the 'params' input and the node input they are written to
+WORKFLOW_PARAMS = {
+    "positive_prompt": "text",
+    "negative_prompt": "text",
+    "image": "image",
+}
 # Enforce a clean state after each job is done
 # see https://docs.runpod.io/docs/handler-additional-controls#refresh-worker
 REFRESH_WORKER = os.environ.get("REFRESH_WORKER", "false").lower() == "true"
+# Number of input images that are uploaded to ComfyUI in parallel
+INPUT_UPLOAD_WORKERS = 8
+# Number of output images that are fetched and uploaded in parallel
+OUTPUT_PROCESSING_WORKERS = 8
+# Content types of the image and video files ComfyUI workflows commonly save
+CONTENT_TYPES = {
+    ".png": "image/png",
+    ".jpg": "image/jpeg",
+    ".jpeg": "image/jpeg",
+    ".webp": "image/webp",
+    ".gif": "image/gif",
+    ".mp4": "video/mp4",
+    ".webm": "video/webm",
+    ".mov": "video/quicktime",
+    ".avi": "video/x-msvideo",
+}
+# Bytes per chunk when base64 encoding outputs while streaming (multiple of 3)
+BASE64_CHUNK_SIZE = 57 * 1024
+# Upload large outputs (videos) as multipart uploads with concurrent 8 MB parts.
+# Each upload runs its own part threads, so the total number of parallel
+# requests is up to OUTPUT_PROCESSING_WORKERS * max_concurrency.
+S3_TRANSFER_CONFIG = TransferConfig(
+    multipart_threshold=8 * 1024 * 1024,
+    multipart_chunksize=8 * 1024 * 1024,
+    max_concurrency=10,
+    use_threads=True,
+)
+# Size the connection pool of the shared S3 client for all upload threads, so
+# that connections are kept alive instead of being discarded when the pool is full
+S3_CLIENT_CONFIG = Config(
+    signature_version="s3v4",
+    max_pool_connections=OUTPUT_PROCESSING_WORKERS * S3_TRANSFER_CONFIG.max_concurrency,
+    tcp_keepalive=True,
+    retries={"max_attempts": 3, "mode": "adaptive"},
+)
+
+# Shared HTTP session for all requests to ComfyUI, so connections are kept
+# alive and reused across calls, threads and jobs instead of reconnecting each time.
+# Every worker thread can hold a connection (output workers keep /view streams open
+# for a whole upload) while the main thread queries /history, hence the +1.
+comfy_session = requests.Session()
+comfy_session.mount(
+    "http://",
+    HTTPAdapter(pool_maxsize=max(INPUT_UPLOAD_WORKERS, OUTPUT_PROCESSING_WORKERS) + 1),
+)
+
+# Monotonic timestamp of the last time ComfyUI answered, see _mark_comfy_reachable()
+_comfy_last_reachable = float("-inf")
+
+# Shared S3 client, created lazily by _get_s3_client()
+_s3_client = None
+_s3_client_lock = threading.Lock()
 
 # ---------------------------------------------------------------------------
 # Helper: quick reachability probe of ComfyUI HTTP endpoint (port 8188)
@@ -47,7 +128,7 @@ REFRESH_WORKER = os.environ.get("REFRESH_WORKER", "false").lower() == "true"
 def _comfy_server_status():
     """Return a dictionary with basic reachability info for the ComfyUI HTTP server."""
     try:
-        resp = requests.get(f"http://{COMFY_HOST}/", timeout=5)
+        resp = comfy_session.get(f"http://{COMFY_HOST}/", timeout=5)
         return {
             "reachable": resp.status_code == 200,
             "status_code": resp.status_code,
@@ -56,6 +137,17 @@ def _comfy_server_status():
         return {"reachable": False, "error": str(exc)}
 
 
+def _mark_comfy_reachable():
+    """Remember that ComfyUI just answered a request."""
+    global _comfy_last_reachable
+    _comfy_last_reachable = time.monotonic()
+
+
+def _comfy_recently_reachable():
+    """Return True if ComfyUI answered within the last COMFY_REACHABLE_CACHE_S seconds."""
+    return time.monotonic() - _comfy_last_reachable < COMFY_REACHABLE_CACHE_S
+
+
 def _attempt_websocket_reconnect(ws_url, max_attempts, delay_s, initial_error):
     """
     Attempts to reconnect to the WebSocket server after a disconnect.
@@ -154,6 +246,13 @@ def validate_input(job_input):
     if workflow is None:
         return None, "Missing 'workflow' parameter"
 
+    # A string references one of the workflows bundled into the image
+    if isinstance(workflow, str) and workflow not in get_workflow_names():
+        return (
+            None,
+            f"Unknown workflow '{workflow}'. Available workflows: {', '.join(sorted(get_workflow_names()))}",
+        )
+
     # Validate 'images' in input, if provided
     images = job_input.get("images")
     if images is not None:
@@ -165,6 +264,21 @@ def validate_input(job_input):
                 "'images' must be a list of objects with 'name' and 'image' keys",
             )
 
+    # Validate 'params' in input, if provided
+    params = job_input.get("params")
+    if params is not None:
+        if not isinstance(params, dict):
+            return None, "'params' must be an object"
+        supported_params = {"prompt", *WORKFLOW_PARAMS}
+        unknown_params = sorted(set(params) - supported_params)
+        if unknown_params:
+            return (
+                None,
+                f"Unknown params: {', '.join(unknown_params)}. Supported params: {', '.join(sorted(supported_params))}",
+            )
+        if not all(isinstance(value, str) for value in params.values()):
+            return None, "'params' values must be strings"
+
     # Optional: API key for Comfy.org API Nodes, passed per-request
     comfy_org_api_key = job_input.get("comfy_org_api_key")
 
@@ -172,10 +286,153 @@ def validate_input(job_input):
     return {
         "workflow": workflow,
         "images": images,
+        "params": params,
         "comfy_org_api_key": comfy_org_api_key,
     }, None
 
 
+@functools.lru_cache(maxsize=None)
+def get_workflow_names():
+    """
+    List the workflows bundled into the image.
+
+    Returns:
+        frozenset: The workflow names (filenames without the .json extension).
+    """
+    if not os.path.isdir(COMFY_WORKFLOWS_DIR):
+        return frozenset()
+    return frozenset(
+        os.path.splitext(entry)[0]
+        for entry in os.listdir(COMFY_WORKFLOWS_DIR)
+        if entry.endswith(".json")
+    )
+
+
+@functools.lru_cache(maxsize=None)
+def _read_workflow(name):
+    """Read a bundled workflow file once and keep its contents in memory."""
+    with open(os.path.join(COMFY_WORKFLOWS_DIR, f"{name}.json"), encoding="utf-8") as f:
+        return f.read()
+
+
+def load_workflow(name):
+    """
+    Load one of the workflows bundled into the image.
+
+    The file is only read from disk once. Every call parses the cached JSON
+    into a new dictionary, so callers are free to modify the result (parsing
+    is cheaper than a deep copy of the graph).
+
+    Args:
+        name (str): The workflow name (filename without the .json extension).
+
+    Returns:
+        dict: The workflow.
+    """
+    return json.loads(_read_workflow(name))
+
+
+def index_workflow(workflow):
+    """
+    Find the nodes of a workflow that can be updated through the 'params' input.
+
+    Prompts are told apart by how they are wired: a CLIPTextEncode node feeding
+    a 'positive' input holds the positive prompt, one feeding a 'negative'
+    input holds the negative prompt.
+
+    Args:
+        workflow (dict): The workflow in API format.
+
+    Returns:
+        dict: Lists of node IDs for each supported parameter (see WORKFLOW_PARAMS).
+    """
+    index = {param: [] for param in WORKFLOW_PARAMS}
+    # Malformed workflows (e.g. UI format exports) are left for ComfyUI to reject
+    if not isinstance(workflow, dict):
+        return index
+    for node_id, node in workflow.items():
+        if not isinstance(node, dict):
+            continue
+        inputs = node.get("inputs", {})
+        if not isinstance(inputs, dict):
+            continue
+        for param, input_name in (
+            ("positive_prompt", "positive"),
+            ("negative_prompt", "negative"),
+        ):
+            link = inputs.get(input_name)
+            if not isinstance(link, list) or not link:
+                continue
+            source_id = str(link[0])
+            source = workflow.get(source_id)
+            if (
+                isinstance(source, dict)
+                and source.get("class_type") == "CLIPTextEncode"
+                and source_id not in index[param]
+            ):
+                index[param].append(source_id)
+        if node.get("class_type") == "LoadImage":
+            index["image"].append(node_id)
+    return index
+
+
+def make_workflow_updater(index):
+    """
+    Build a function that writes the 'params' input into a workflow.
+
+    The index is turned into (param, node_ids, input_name) targets once, so
+    applying params to a job looks up each given value once and then does a
+    handful of direct assignments.
+
+    Args:
+        index (dict): The index of the workflow, see index_workflow().
+
+    Returns:
+        callable: update(workflow, params), which updates the workflow in place.
+            Raises ValueError if one of the params matches no node of the workflow.
+    """
+    targets = tuple(
+        (param, tuple(node_ids), WORKFLOW_PARAMS[param])
+        for param, node_ids in index.items()
+        if node_ids
+    )
+    supported_params = {param for param, _, _ in targets}
+    if "positive_prompt" in supported_params:
+        supported_params.add("prompt")
+
+    def update(workflow, params):
+        unmatched_params = sorted(set(params) - supported_params)
+        if unmatched_params:
+            raise ValueError(
+                f"The workflow has no node for params: {', '.join(unmatched_params)}"
+            )
+        for param, node_ids, input_name in targets:
+            value = params.get(param)
+            # 'prompt' is accepted as a shorthand for 'positive_prompt'
+            if value is None and param == "positive_prompt":
+                value = params.get("prompt")
+            if value is None:
+                continue
+            for node_id in node_ids:
+                workflow[node_id].setdefault("inputs", {})[input_name] = value
+
+    return update
+
+
+@functools.lru_cache(maxsize=None)
+def get_workflow_updater(name):
+    """
+    Return the (cached) params updater of a workflow bundled into the image.
+
+    Args:
+        name (str): The workflow name (filename without the .json extension).
+
+    Returns:
+        callable: update(workflow, params), see make_workflow_updater().
+    """
+    return make_workflow_updater(index_workflow(load_workflow(name)))
+
+
 def check_server(url, retries=500, delay=50):
     """
     Check if a server is reachable via HTTP GET request
@@ -192,7 +449,7 @@ def check_server(url, retries=500, delay=50):
     print(f"worker-comfyui - Checking API server at {url}...")
     for i in range(retries):
         try:
-            response = requests.get(url, timeout=5)
+            response = comfy_session.get(url, timeout=5)
 
             # If the response status code is 200, the server is up and running
             if response.status_code == 200:
@@ -212,10 +469,65 @@ def check_server(url, retries=500, delay=50):
     return False
 
 
+def _upload_image(image):
+    """
+    Upload a single base64 encoded image to the ComfyUI server using the /upload/image endpoint.
+
+    Args:
+        image (dict): A dictionary containing the 'name' of the image and the 'image' as a base64 encoded string.
+
+    Returns:
+        tuple: A success message (or None) and an error message (or None).
+    """
+    try:
+        name = image["name"]
+        image_data_uri = image["image"]  # Get the full string (might have prefix)
+
+        # --- Strip Data URI prefix if present ---
+        if "," in image_data_uri:
+            # Find the comma and take everything after it
+            base64_data = image_data_uri.split(",", 1)[1]
+        else:
+            # Assume it's already pure base64
+            base64_data = image_data_uri
+        # --- End strip ---
+
+        blob = base64.b64decode(base64_data)  # Decode the cleaned data
+
+        # Prepare the form data
+        files = {
+            "image": (name, BytesIO(blob), "image/png"),
+            "overwrite": (None, "true"),
+        }
+
+        # POST request to upload the image
+        response = comfy_session.post(
+            f"http://{COMFY_HOST}/upload/image", files=files, timeout=30
+        )
+        response.raise_for_status()
+
+        print(f"worker-comfyui - Successfully uploaded {name}")
+        return f"Successfully uploaded {name}", None
+
+    except base64.binascii.Error as e:
+        error_msg = f"Error decoding base64 for {image.get('name', 'unknown')}: {e}"
+    except requests.Timeout:
+        error_msg = f"Timeout uploading {image.get('name', 'unknown')}"
+    except requests.RequestException as e:
+        error_msg = f"Error uploading {image.get('name', 'unknown')}: {e}"
+    except Exception as e:
+        error_msg = f"Unexpected error uploading {image.get('name', 'unknown')}: {e}"
+    print(f"worker-comfyui - {error_msg}")
+    return None, error_msg
+
+
 def upload_images(images):
     """
     Upload a list of base64 encoded images to the ComfyUI server using the /upload/image endpoint.
 
+    The images are uploaded concurrently, so the total time is bound by the
+    slowest upload instead of the sum of all uploads.
+
     Args:
         images (list): A list of dictionaries, each containing the 'name' of the image and the 'image' as a base64 encoded string.
 
@@ -230,55 +542,14 @@ def upload_images(images):
 
     print(f"worker-comfyui - Uploading {len(images)} image(s)...")
 
-    for image in images:
-        try:
-            name = image["name"]
-            image_data_uri = image["image"]  # Get the full string (might have prefix)
-
-            # --- Strip Data URI prefix if present ---
-            if "," in image_data_uri:
-                # Find the comma and take everything after it
-                base64_data = image_data_uri.split(",", 1)[1]
-            else:
-                # Assume it's already pure base64
-                base64_data = image_data_uri
-            # --- End strip ---
-
-            blob = base64.b64decode(base64_data)  # Decode the cleaned data
-
-            # Prepare the form data
-            files = {
-                "image": (name, BytesIO(blob), "image/png"),
-                "overwrite": (None, "true"),
-            }
-
-            # POST request to upload the image
-            response = requests.post(
-                f"http://{COMFY_HOST}/upload/image", files=files, timeout=30
-            )
-            response.raise_for_status()
-
-            responses.append(f"Successfully uploaded {name}")
-            print(f"worker-comfyui - Successfully uploaded {name}")
-
-        except base64.binascii.Error as e:
-            error_msg = f"Error decoding base64 for {image.get('name', 'unknown')}: {e}"
-            print(f"worker-comfyui - {error_msg}")
-            upload_errors.append(error_msg)
-        except requests.Timeout:
-            error_msg = f"Timeout uploading {image.get('name', 'unknown')}"
-            print(f"worker-comfyui - {error_msg}")
-            upload_errors.append(error_msg)
-        except requests.RequestException as e:
-            error_msg = f"Error uploading {image.get('name', 'unknown')}: {e}"
-            print(f"worker-comfyui - {error_msg}")
-            upload_errors.append(error_msg)
-        except Exception as e:
-            error_msg = (
-                f"Unexpected error uploading {image.get('name', 'unknown')}: {e}"
-            )
-            print(f"worker-comfyui - {error_msg}")
-            upload_errors.append(error_msg)
+    with ThreadPoolExecutor(
+        max_workers=min(INPUT_UPLOAD_WORKERS, len(images))
+    ) as executor:
+        for response, error_msg in executor.map(_upload_image, images):
+            if response:
+                responses.append(response)
+            if error_msg:
+                upload_errors.append(error_msg)
 
     if upload_errors:
         print(f"worker-comfyui - image(s) upload finished with errors")
@@ -296,6 +567,42 @@ def upload_images(images):
     }
 
 
+def find_new_input_images(images):
+    """
+    Find the input images that don't exist yet in the ComfyUI input directory.
+
+    Only these are removed after the job, so static input files baked into
+    the image are never deleted, even when an upload overwrites one of them.
+
+    Args:
+        images (list): The 'images' input of the job, see upload_images().
+
+    Returns:
+        list: Paths the upload of the images will create.
+    """
+    paths = []
+    for image in images:
+        path = os.path.join(COMFY_INPUT_DIR, os.path.basename(image["name"]))
+        if not os.path.exists(path) and path not in paths:
+            paths.append(path)
+    return paths
+
+
+def remove_input_images(paths):
+    """
+    Remove the input images a job uploaded from the ComfyUI input directory.
+
+    Args:
+        paths (list): The paths to remove, see find_new_input_images().
+    """
+    for path in paths:
+        try:
+            os.remove(path)
+        except OSError:
+            # Already gone or never uploaded
+            pass
+
+
 def get_available_models():
     """
     Get list of available models from ComfyUI
@@ -304,7 +611,7 @@ def get_available_models():
         dict: Dictionary containing available models by type
     """
     try:
-        response = requests.get(f"http://{COMFY_HOST}/object_info", timeout=10)
+        response = comfy_session.get(f"http://{COMFY_HOST}/object_info", timeout=10)
         response.raise_for_status()
         object_info = response.json()
 
@@ -353,9 +660,9 @@ def queue_workflow(workflow, client_id, comfy_org_api_key=None):
         payload["extra_data"] = {"api_key_comfy_org": effective_key}
     data = json.dumps(payload).encode("utf-8")
 
-    # Use requests for consistency and timeout
+    # Use the shared session for connection reuse and a timeout
     headers = {"Content-Type": "application/json"}
-    response = requests.post(
+    response = comfy_session.post(
         f"http://{COMFY_HOST}/prompt", data=data, headers=headers, timeout=30
     )
 
@@ -450,15 +757,18 @@ def get_history(prompt_id):
     Returns:
         dict: The history of the prompt, containing all the processing steps and results
     """
-    # Use requests for consistency and timeout
-    response = requests.get(f"http://{COMFY_HOST}/history/{prompt_id}", timeout=30)
+    # Use the shared session for connection reuse and a timeout
+    response = comfy_session.get(f"http://{COMFY_HOST}/history/{prompt_id}", timeout=30)
     response.raise_for_status()
     return response.json()
 
 
-def get_image_data(filename, subfolder, image_type):
+def open_image_stream(filename, subfolder, image_type):
     """
-    Fetch image bytes from the ComfyUI /view endpoint.
+    Open a streaming request for an image on the ComfyUI /view endpoint.
+
+    The body is not read yet, so the image never has to be held in memory as
+    a whole. Use the response as a context manager to release the connection.
 
     Args:
         filename (str): The filename of the image.
@@ -466,19 +776,59 @@ def get_image_data(filename, subfolder, image_type):
         image_type (str): The type of the image (e.g., 'output').
 
     Returns:
-        bytes: The raw image data, or None if an error occurs.
+        requests.Response: The streaming response.
+
+    Raises:
+        requests.RequestException: If the request fails.
     """
     print(
         f"worker-comfyui - Fetching image data: type={image_type}, subfolder={subfolder}, filename={filename}"
     )
     data = {"filename": filename, "subfolder": subfolder, "type": image_type}
     url_values = urllib.parse.urlencode(data)
+    # Use the shared session for connection reuse and a timeout
+    response = comfy_session.get(
+        f"http://{COMFY_HOST}/view?{url_values}", timeout=60, stream=True
+    )
     try:
-        # Use requests for consistency and timeout
-        response = requests.get(f"http://{COMFY_HOST}/view?{url_values}", timeout=60)
         response.raise_for_status()
+    except requests.RequestException:
+        response.close()
+        raise
+    # Let urllib3 undo any content encoding when reading from response.raw
+    response.raw.decode_content = True
+    return response
+
+
+def get_image_base64(filename, subfolder, image_type):
+    """
+    Fetch an image from the ComfyUI /view endpoint and encode it as base64 while streaming.
+
+    The response is encoded in chunks as it arrives, so the raw image is never
+    held in memory as a whole next to its base64 representation.
+
+    Args:
+        filename (str): The filename of the image.
+        subfolder (str): The subfolder where the image is stored.
+        image_type (str): The type of the image (e.g., 'output').
+
+    Returns:
+        str: The base64 encoded image, or None if an error occurs.
+    """
+    try:
+        with open_image_stream(filename, subfolder, image_type) as response:
+            encoded_chunks = []
+            leftover = b""
+            for chunk in response.iter_content(chunk_size=BASE64_CHUNK_SIZE):
+                # Only encode multiples of 3 bytes so that no padding ends up
+                # in the middle of the output, carry the rest over
+                chunk = leftover + chunk
+                cut = len(chunk) - len(chunk) % 3
+                encoded_chunks.append(base64.b64encode(chunk[:cut]).decode("ascii"))
+                leftover = chunk[cut:]
+            encoded_chunks.append(base64.b64encode(leftover).decode("ascii"))
         print(f"worker-comfyui - Successfully fetched image data for {filename}")
-        return response.content
+        return "".join(encoded_chunks)
     except requests.Timeout:
         print(f"worker-comfyui - Timeout fetching image data for {filename}")
         return None
@@ -492,6 +842,401 @@ def get_image_data(filename, subfolder, image_type):
         return None
 
 
+def _get_execution_errors(prompt_history):
+    """
+    Extract the execution errors from the history entry of a finished prompt.
+
+    Args:
+        prompt_history (dict): The history entry of the prompt.
+
+    Returns:
+        list: Execution errors reported by ComfyUI for the prompt (empty on success).
+    """
+    status = prompt_history.get("status", {})
+    errors = []
+    if status.get("status_str") == "error":
+        for event, data in status.get("messages", []):
+            if event == "execution_error":
+                error_details = f"Node Type: {data.get('node_type')}, Node ID: {data.get('node_id')}, Message: {data.get('exception_message')}"
+                errors.append(f"Workflow execution error: {error_details}")
+        if not errors:
+            errors.append("Workflow execution error: unknown error")
+    return errors
+
+
+def _poll_history_for_completion(prompt_id, timeout_s):
+    """
+    Poll the /history endpoint until the given prompt shows up as finished.
+
+    This is the fallback for when the websocket dropped and could not be
+    re-established although ComfyUI's HTTP server is still reachable.
+
+    Args:
+        prompt_id (str): The ID of the prompt to wait for.
+        timeout_s (int): Maximum number of seconds to keep polling.
+
+    Returns:
+        list: Execution errors reported by ComfyUI for the prompt (empty on success).
+
+    Raises:
+        ValueError: If the prompt did not finish within the timeout.
+        websocket.WebSocketConnectionClosedException: If ComfyUI became unreachable.
+    """
+    print(
+        f"worker-comfyui - Falling back to polling /history for prompt {prompt_id} (timeout {timeout_s}s)..."
+    )
+    start = time.monotonic()
+    delay_ms = COMFY_POLLING_INITIAL_INTERVAL_MS
+    while time.monotonic() - start < timeout_s:
+        try:
+            history = get_history(prompt_id)
+        except requests.ConnectionError as e:
+            # If ComfyUI itself is down the prompt will never finish – bail out
+            # instead of polling until the timeout, like the websocket reconnect does.
+            srv_status = _comfy_server_status()
+            if not srv_status["reachable"]:
+                print(
+                    f"worker-comfyui - ComfyUI HTTP unreachable – aborting history polling: {e}"
+                )
+                raise websocket.WebSocketConnectionClosedException(
+                    "ComfyUI HTTP unreachable while polling history"
+                )
+            print(f"worker-comfyui - Error polling history: {e}")
+            history = {}
+        except requests.RequestException as e:
+            print(f"worker-comfyui - Error polling history: {e}")
+            history = {}
+
+        # ComfyUI only adds a prompt to the history once it finished executing
+        prompt_history = history.get(prompt_id)
+        if prompt_history:
+            print(f"worker-comfyui - Execution finished for prompt {prompt_id}")
+            return _get_execution_errors(prompt_history)
+
+        time.sleep(delay_ms / 1000)
+        delay_ms = min(
+            delay_ms * COMFY_POLLING_BACKOFF_FACTOR, COMFY_POLLING_MAX_INTERVAL_MS
+        )
+
+    raise ValueError(
+        f"Timed out after {timeout_s}s waiting for prompt {prompt_id} to finish."
+    )
+
+
+def wait_for_completion(ws, ws_url, prompt_id, on_output=None):
+    """
+    Wait for ComfyUI to finish executing a prompt by listening on the websocket.
+
+    If the websocket drops and cannot be re-established while ComfyUI's HTTP
+    server is still reachable, falls back to polling /history. The whole wait
+    is bounded by COMFY_POLLING_TIMEOUT_S.
+
+    Args:
+        ws (websocket.WebSocket): The connected websocket.
+        ws_url (str): The WebSocket URL (including client_id), used for reconnects.
+        prompt_id (str): The ID of the prompt to wait for.
+        on_output (callable, optional): Called with (node_id, node_output) as soon as
+            a node of the prompt reports its outputs, while the rest is still executing.
+
+    Returns:
+        tuple: The (possibly reconnected) websocket and a list of execution errors.
+
+    Raises:
+        ValueError: If the prompt did not finish within COMFY_POLLING_TIMEOUT_S.
+    """
+    print(f"worker-comfyui - Waiting for workflow execution ({prompt_id})...")
+    deadline = time.monotonic() + COMFY_POLLING_TIMEOUT_S
+    while True:
+        if time.monotonic() >= deadline:
+            raise ValueError(
+                f"Timed out after {COMFY_POLLING_TIMEOUT_S}s waiting for prompt {prompt_id} to finish."
+            )
+        try:
+            out = ws.recv()
+            if isinstance(out, str):
+                message = json.loads(out)
+                if message.get("type") == "status":
+                    status_data = message.get("data", {}).get("status", {})
+                    print(
+                        f"worker-comfyui - Status update: {status_data.get('exec_info', {}).get('queue_remaining', 'N/A')} items remaining in queue"
+                    )
+                elif message.get("type") == "executing":
+                    data = message.get("data", {})
+                    if data.get("node") is None and data.get("prompt_id") == prompt_id:
+                        print(
+                            f"worker-comfyui - Execution finished for prompt {prompt_id}"
+                        )
+                        return ws, []
+                elif message.get("type") == "executed":
+                    data = message.get("data", {})
+                    if (
+                        on_output
+                        and data.get("prompt_id") == prompt_id
+                        and data.get("output")
+                    ):
+                        on_output(data.get("node"), data["output"])
+                elif message.get("type") == "execution_error":
+                    data = message.get("data", {})
+                    if data.get("prompt_id") == prompt_id:
+                        error_details = f"Node Type: {data.get('node_type')}, Node ID: {data.get('node_id')}, Message: {data.get('exception_message')}"
+                        print(
+                            f"worker-comfyui - Execution error received: {error_details}"
+                        )
+                        return ws, [f"Workflow execution error: {error_details}"]
+            else:
+                continue
+        except websocket.WebSocketTimeoutException:
+            print(f"worker-comfyui - Websocket receive timed out. Still waiting...")
+            continue
+        except websocket.WebSocketConnectionClosedException as closed_err:
+            try:
+                # Attempt to reconnect
+                ws = _attempt_websocket_reconnect(
+                    ws_url,
+                    WEBSOCKET_RECONNECT_ATTEMPTS,
+                    WEBSOCKET_RECONNECT_DELAY_S,
+                    closed_err,
+                )
+
+                # The end of the execution may have been announced while the
+                # websocket was down, in which case that message is lost
+                try:
+                    prompt_history = get_history(prompt_id).get(prompt_id)
+                except requests.RequestException as e:
+                    print(f"worker-comfyui - Error checking history after reconnect: {e}")
+                    prompt_history = None
+                if prompt_history:
+                    print(
+                        f"worker-comfyui - Execution finished for prompt {prompt_id} while reconnecting"
+                    )
+                    return ws, _get_execution_errors(prompt_history)
+
+                print(
+                    "worker-comfyui - Resuming message listening after successful reconnect."
+                )
+                continue
+            except websocket.WebSocketConnectionClosedException:
+                # Only fall back to HTTP polling if ComfyUI is still alive,
+                # otherwise let the "ComfyUI crashed" error propagate.
+                if not _comfy_server_status()["reachable"]:
+                    raise
+                return ws, _poll_history_for_completion(
+                    prompt_id, max(0, round(deadline - time.monotonic()))
+                )
+        except json.JSONDecodeError:
+            print(f"worker-comfyui - Received invalid JSON message via websocket.")
+
+
+def _get_s3_client():
+    """
+    Return the shared S3 client, creating it on first use.
+
+    boto3 clients are thread-safe, so a single client is shared by all
+    upload threads and across jobs instead of paying the setup cost per upload.
+
+    Returns:
+        botocore.client.BaseClient: The S3 client, or None if the bucket credentials are not configured.
+    """
+    global _s3_client
+    with _s3_client_lock:
+        if _s3_client is None:
+            endpoint_url = os.environ.get("BUCKET_ENDPOINT_URL")
+            access_key_id = os.environ.get("BUCKET_ACCESS_KEY_ID")
+            secret_access_key = os.environ.get("BUCKET_SECRET_ACCESS_KEY")
+            if not (endpoint_url and access_key_id and secret_access_key):
+                return None
+
+            _s3_client = boto3.client(
+                "s3",
+                endpoint_url=endpoint_url,
+                aws_access_key_id=access_key_id,
+                aws_secret_access_key=secret_access_key,
+                region_name=rp_upload.extract_region_from_url(endpoint_url),
+                config=S3_CLIENT_CONFIG,
+            )
+        return _s3_client
+
+
+def upload_to_s3(job_id, source, file_extension):
+    """
+    Upload a file to the S3 bucket and return a presigned URL to it.
+
+    Mirrors the object layout of `rp_upload.upload_image` but reuses a single
+    S3 client. If the bucket credentials are missing, the upload is simulated
+    by saving the file to the 'simulated_uploaded' folder, like
+    `rp_upload.upload_image` does.
+
+    Args:
+        job_id (str): The job ID, used as the key prefix.
+        source (str or file-like): The path of a local file, or an open (binary)
+            file object. Local files are uploaded with `upload_file`, which reads
+            each multipart part straight from disk instead of buffering it.
+        file_extension (str): The lowercase file extension, including the leading dot.
+
+    Returns:
+        str: A presigned URL (or the simulated upload location).
+    """
+    file_name = f"{str(uuid.uuid4())[:8]}{file_extension}"
+
+    s3_client = _get_s3_client()
+    if s3_client is None:
+        print(
+            "worker-comfyui - No bucket credentials set, saving to disk folder 'simulated_uploaded'"
+        )
+        os.makedirs("simulated_uploaded", exist_ok=True)
+        sim_upload_location = f"simulated_uploaded/{file_name}"
+        if isinstance(source, str):
+            shutil.copyfile(source, sim_upload_location)
+        else:
+            with open(sim_upload_location, "wb") as output_file:
+                shutil.copyfileobj(source, output_file)
+        return sim_upload_location
+
+    bucket = time.strftime("%m-%y")
+    key = f"{job_id}/{file_name}"
+    extra_args = {
+        "ContentType": CONTENT_TYPES.get(file_extension, "application/octet-stream")
+    }
+
+    if isinstance(source, str):
+        s3_client.upload_file(
+            source, bucket, key, Config=S3_TRANSFER_CONFIG, ExtraArgs=extra_args
+        )
+    else:
+        s3_client.upload_fileobj(
+            source, bucket, key, Config=S3_TRANSFER_CONFIG, ExtraArgs=extra_args
+        )
+
+    return s3_client.generate_presigned_url(
+        "get_object", Params={"Bucket": bucket, "Key": key}, ExpiresIn=604800
+    )
+
+
+def collect_output_images(node_id, node_output):
+    """
+    Pick the images to return from the outputs of a single node.
+
+    Args:
+        node_id (str): The ID of the node.
+        node_output (dict): The outputs of the node, as reported in the prompt history.
+
+    Returns:
+        tuple: The list of image entries to process and a list of warnings.
+    """
+    images = []
+    warnings = []
+    if "images" in node_output:
+        print(
+            f"worker-comfyui - Node {node_id} contains {len(node_output['images'])} image(s)"
+        )
+        for image_info in node_output["images"]:
+            filename = image_info.get("filename")
+
+            # skip temp images
+            if image_info.get("type") == "temp":
+                print(
+                    f"worker-comfyui - Skipping image {filename} because type is 'temp'"
+                )
+                continue
+
+            if not filename:
+                warn_msg = f"Skipping image in node {node_id} due to missing filename: {image_info}"
+                print(f"worker-comfyui - {warn_msg}")
+                warnings.append(warn_msg)
+                continue
+
+            images.append(image_info)
+
+    # Check for other output types
+    other_keys = [k for k in node_output.keys() if k != "images"]
+    if other_keys:
+        warn_msg = f"Node {node_id} produced unhandled output keys: {other_keys}."
+        print(f"worker-comfyui - WARNING: {warn_msg}")
+        print(
+            f"worker-comfyui - --> If this output is useful, please consider opening an issue on GitHub to discuss adding support."
+        )
+    return images, warnings
+
+
+def _get_local_output_path(filename, subfolder, image_type):
+    """
+    Find an output file in the ComfyUI output directory.
+
+    Args:
+        filename (str): The filename of the image.
+        subfolder (str): The subfolder where the image is stored.
+        image_type (str): The type of the image (e.g., 'output').
+
+    Returns:
+        str: The path of the file, or None if it isn't available locally.
+    """
+    if image_type != "output":
+        return None
+    path = os.path.join(COMFY_OUTPUT_DIR, subfolder, filename)
+    return path if os.path.isfile(path) else None
+
+
+def process_output_image(job_id, image_info):
+    """
+    Fetch a single output image from ComfyUI and upload it to S3 or encode it as base64.
+
+    Args:
+        job_id (str): The job ID, used for the S3 upload path.
+        image_info (dict): The image entry from the prompt history ('filename', 'subfolder', 'type').
+
+    Returns:
+        tuple: The output entry (or None) and an error message (or None).
+    """
+    filename = image_info.get("filename")
+    subfolder = image_info.get("subfolder", "")
+    img_type = image_info.get("type")
+
+    if not os.environ.get("BUCKET_ENDPOINT_URL"):
+        # Return as base64 string
+        base64_image = get_image_base64(filename, subfolder, img_type)
+        if not base64_image:
+            return (
+                None,
+                f"Failed to fetch image data for {filename} from /view endpoint.",
+            )
+        print(f"worker-comfyui - Encoded {filename} as base64")
+        return {"filename": filename, "type": "base64", "data": base64_image}, None
+
+    file_extension = os.path.splitext(filename)[1].lower() or ".png"
+
+    # Upload from disk when possible, so the file doesn't have to be served
+    # by ComfyUI first and boto3 can read the parts of large videos from disk
+    # in parallel. Otherwise pipe the /view response straight into the upload,
+    # so the image is never buffered as a whole in memory.
+    source = _get_local_output_path(filename, subfolder, img_type)
+    response = None
+    if source:
+        print(f"worker-comfyui - Uploading {filename} to S3 from disk...")
+    else:
+        try:
+            response = open_image_stream(filename, subfolder, img_type)
+        except requests.RequestException as e:
+            error_msg = (
+                f"Failed to fetch image data for {filename} from /view endpoint: {e}"
+            )
+            print(f"worker-comfyui - {error_msg}")
+            return None, error_msg
+        source = response.raw
+        print(f"worker-comfyui - Uploading {filename} to S3...")
+
+    try:
+        s3_url = upload_to_s3(job_id, source, file_extension)
+        print(f"worker-comfyui - Uploaded {filename} to S3: {s3_url}")
+        return {"filename": filename, "type": "s3_url", "data": s3_url}, None
+    except Exception as e:
+        error_msg = f"Error uploading {filename} to S3: {e}"
+        print(f"worker-comfyui - {error_msg}")
+        return None, error_msg
+    finally:
+        if response is not None:
+            response.close()
+
+
 def handler(job):
     """
     Handles a job using ComfyUI via websockets for status and image retrieval.
@@ -512,22 +1257,39 @@ def handler(job):
 
     # Extract validated data
     workflow = validated_data["workflow"]
+    params = validated_data.get("params")
+    try:
+        if isinstance(workflow, str):
+            workflow_name = workflow
+            workflow = load_workflow(workflow_name)
+            if params:
+                get_workflow_updater(workflow_name)(workflow, params)
+        elif params:
+            make_workflow_updater(index_workflow(workflow))(workflow, params)
+    except ValueError as e:
+        return {"error": str(e)}
     input_images = validated_data.get("images")
 
-    # Make sure that the ComfyUI HTTP API is available before proceeding
-    if not check_server(
-        f"http://{COMFY_HOST}/",
-        COMFY_API_AVAILABLE_MAX_RETRIES,
-        COMFY_API_AVAILABLE_INTERVAL_MS,
-    ):
-        return {
-            "error": f"ComfyUI server ({COMFY_HOST}) not reachable after multiple retries."
-        }
+    # Make sure that the ComfyUI HTTP API is available before proceeding.
+    # On a warm worker ComfyUI answered a moment ago, so the probe is skipped.
+    if not _comfy_recently_reachable():
+        if not check_server(
+            f"http://{COMFY_HOST}/",
+            COMFY_API_AVAILABLE_MAX_RETRIES,
+            COMFY_API_AVAILABLE_INTERVAL_MS,
+        ):
+            return {
+                "error": f"ComfyUI server ({COMFY_HOST}) not reachable after multiple retries."
+            }
+        _mark_comfy_reachable()
 
     # Upload input images if they exist
+    new_input_images = []
     if input_images:
+        new_input_images = find_new_input_images(input_images)
         upload_result = upload_images(input_images)
         if upload_result["status"] == "error":
+            remove_input_images(new_input_images)
             # Return upload errors
             return {
                 "error": "Failed to upload one or more input images",
@@ -540,6 +1302,22 @@ def handler(job):
     output_data = []
     errors = []
 
+    # Fetching from /view and uploading to S3 is I/O bound, so images are
+    # processed in the background as soon as their node finished executing,
+    # while ComfyUI keeps working on the rest of the workflow.
+    executor = ThreadPoolExecutor(max_workers=OUTPUT_PROCESSING_WORKERS)
+    futures = []
+    processed_nodes = set()
+
+    def process_node_output(node_id, node_output):
+        if node_id in processed_nodes:
+            return
+        processed_nodes.add(node_id)
+        images, warnings = collect_output_images(node_id, node_output)
+        errors.extend(warnings)
+        for image_info in images:
+            futures.append(executor.submit(process_output_image, job_id, image_info))
+
     try:
         # Establish WebSocket connection
         ws_url = f"ws://{COMFY_HOST}/ws?clientId={client_id}"
@@ -574,75 +1352,15 @@ def handler(job):
                 raise ValueError(f"Unexpected error queuing workflow: {e}")
 
         # Wait for execution completion via WebSocket
-        print(f"worker-comfyui - Waiting for workflow execution ({prompt_id})...")
-        execution_done = False
-        while True:
-            try:
-                out = ws.recv()
-                if isinstance(out, str):
-                    message = json.loads(out)
-                    if message.get("type") == "status":
-                        status_data = message.get("data", {}).get("status", {})
-                        print(
-                            f"worker-comfyui - Status update: {status_data.get('exec_info', {}).get('queue_remaining', 'N/A')} items remaining in queue"
-                        )
-                    elif message.get("type") == "executing":
-                        data = message.get("data", {})
-                        if (
-                            data.get("node") is None
-                            and data.get("prompt_id") == prompt_id
-                        ):
-                            print(
-                                f"worker-comfyui - Execution finished for prompt {prompt_id}"
-                            )
-                            execution_done = True
-                            break
-                    elif message.get("type") == "execution_error":
-                        data = message.get("data", {})
-                        if data.get("prompt_id") == prompt_id:
-                            error_details = f"Node Type: {data.get('node_type')}, Node ID: {data.get('node_id')}, Message: {data.get('exception_message')}"
-                            print(
-                                f"worker-comfyui - Execution error received: {error_details}"
-                            )
-                            errors.append(f"Workflow execution error: {error_details}")
-                            break
-                else:
-                    continue
-            except websocket.WebSocketTimeoutException:
-                print(f"worker-comfyui - Websocket receive timed out. Still waiting...")
-                continue
-            except websocket.WebSocketConnectionClosedException as closed_err:
-                try:
-                    # Attempt to reconnect
-                    ws = _attempt_websocket_reconnect(
-                        ws_url,
-                        WEBSOCKET_RECONNECT_ATTEMPTS,
-                        WEBSOCKET_RECONNECT_DELAY_S,
-                        closed_err,
-                    )
-
-                    print(
-                        "worker-comfyui - Resuming message listening after successful reconnect."
-                    )
-                    continue
-                except (
-                    websocket.WebSocketConnectionClosedException
-                ) as reconn_failed_err:
-                    # If _attempt_websocket_reconnect fails, it raises this exception
-                    # Let this exception propagate to the outer handler's except block
-                    raise reconn_failed_err
-
-            except json.JSONDecodeError:
-                print(f"worker-comfyui - Received invalid JSON message via websocket.")
-
-        if not execution_done and not errors:
-            raise ValueError(
-                "Workflow monitoring loop exited without confirmation of completion or error."
-            )
+        ws, execution_errors = wait_for_completion(
+            ws, ws_url, prompt_id, on_output=process_node_output
+        )
+        errors.extend(execution_errors)
 
         # Fetch history even if there were execution errors, some outputs might exist
         print(f"worker-comfyui - Fetching history for prompt {prompt_id}...")
         history = get_history(prompt_id)
+        _mark_comfy_reachable()
 
         if prompt_id not in history:
             error_msg = f"Prompt ID {prompt_id} not found in history after execution."
@@ -665,106 +1383,19 @@ def handler(job):
             if not errors:
                 errors.append(warning_msg)
 
+        # Nodes that already reported their outputs via the websocket are
+        # being processed, this picks up the rest (e.g. cached nodes)
         print(f"worker-comfyui - Processing {len(outputs)} output nodes...")
         for node_id, node_output in outputs.items():
-            if "images" in node_output:
-                print(
-                    f"worker-comfyui - Node {node_id} contains {len(node_output['images'])} image(s)"
-                )
-                for image_info in node_output["images"]:
-                    filename = image_info.get("filename")
-                    subfolder = image_info.get("subfolder", "")
-                    img_type = image_info.get("type")
-
-                    # skip temp images
-                    if img_type == "temp":
-                        print(
-                            f"worker-comfyui - Skipping image {filename} because type is 'temp'"
-                        )
-                        continue
-
-                    if not filename:
-                        warn_msg = f"Skipping image in node {node_id} due to missing filename: {image_info}"
-                        print(f"worker-comfyui - {warn_msg}")
-                        errors.append(warn_msg)
-                        continue
-
-                    image_bytes = get_image_data(filename, subfolder, img_type)
-
-                    if image_bytes:
-                        file_extension = os.path.splitext(filename)[1] or ".png"
-
-                        if os.environ.get("BUCKET_ENDPOINT_URL"):
-                            try:
-                                with tempfile.NamedTemporaryFile(
-                                    suffix=file_extension, delete=False
-                                ) as temp_file:
-                                    temp_file.write(image_bytes)
-                                    temp_file_path = temp_file.name
-                                print(
-                                    f"worker-comfyui - Wrote image bytes to temporary file: {temp_file_path}"
-                                )
-
-                                print(f"worker-comfyui - Uploading {filename} to S3...")
-                                s3_url = rp_upload.upload_image(job_id, temp_file_path)
-                                os.remove(temp_file_path)  # Clean up temp file
-                                print(
-                                    f"worker-comfyui - Uploaded {filename} to S3: {s3_url}"
-                                )
-                                # Append dictionary with filename and URL
-                                output_data.append(
-                                    {
-                                        "filename": filename,
-                                        "type": "s3_url",
-                                        "data": s3_url,
-                                    }
-                                )
-                            except Exception as e:
-                                error_msg = f"Error uploading {filename} to S3: {e}"
-                                print(f"worker-comfyui - {error_msg}")
-                                errors.append(error_msg)
-                                if "temp_file_path" in locals() and os.path.exists(
-                                    temp_file_path
-                                ):
-                                    try:
-                                        os.remove(temp_file_path)
-                                    except OSError as rm_err:
-                                        print(
-                                            f"worker-comfyui - Error removing temp file {temp_file_path}: {rm_err}"
-                                        )
-                        else:
-                            # Return as base64 string
-                            try:
-                                base64_image = base64.b64encode(image_bytes).decode(
-                                    "utf-8"
-                                )
-                                # Append dictionary with filename and base64 data
-                                output_data.append(
-                                    {
-                                        "filename": filename,
-                                        "type": "base64",
-                                        "data": base64_image,
-                                    }
-                                )
-                                print(f"worker-comfyui - Encoded {filename} as base64")
-                            except Exception as e:
-                                error_msg = f"Error encoding {filename} to base64: {e}"
-                                print(f"worker-comfyui - {error_msg}")
-                                errors.append(error_msg)
-                    else:
-                        error_msg = f"Failed to fetch image data for {filename} from /view endpoint."
-                        errors.append(error_msg)
-
-            # Check for other output types
-            other_keys = [k for k in node_output.keys() if k != "images"]
-            if other_keys:
-                warn_msg = (
-                    f"Node {node_id} produced unhandled output keys: {other_keys}."
-                )
-                print(f"worker-comfyui - WARNING: {warn_msg}")
-                print(
-                    f"worker-comfyui - --> If this output is useful, please consider opening an issue on GitHub to discuss adding support."
-                )
+            process_node_output(node_id, node_output)
+
+        # Collect the results in the order the images were submitted
+        for future in futures:
+            output_entry, error_msg = future.result()
+            if output_entry:
+                output_data.append(output_entry)
+            if error_msg:
+                errors.append(error_msg)
 
     except websocket.WebSocketException as e:
         print(f"worker-comfyui - WebSocket Error: {e}")
@@ -783,9 +1414,11 @@ def handler(job):
         print(traceback.format_exc())
         return {"error": f"An unexpected error occurred: {e}"}
     finally:
+        executor.shutdown(cancel_futures=True)
         if ws and ws.connected:
             print(f"worker-comfyui - Closing websocket connection.")
             ws.close()
+        remove_input_images(new_input_images)
 
     final_result = {}
 
@@ -815,4 +1448,7 @@ def handler(job):
 
 if __name__ == "__main__":
     print("worker-comfyui - Starting handler...")
+    # Read and index the bundled workflows up front so the first job doesn't pay for it
+    for workflow_name in get_workflow_names():
+        get_workflow_updater(workflow_name)
     runpod.serverless.start({"handler": handler})
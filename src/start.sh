@@ -12,14 +12,36 @@ echo "worker-comfyui: Starting ComfyUI"
 # Allow operators to tweak verbosity; default is DEBUG.
 : "${COMFY_LOG_LEVEL:=DEBUG}"
 
+# Keep uploaded input images on tmpfs (RAM) instead of the container disk.
+# Fall back to the default directory if /dev/shm is too small or can't be used.
+: "${COMFY_INPUT_DIR:=/dev/shm/comfyui_input}"
+: "${COMFY_INPUT_MIN_FREE_MB:=1024}"
+if [ "${COMFY_INPUT_DIR}" != "/comfyui/input" ]; then
+    if ! mkdir -p "${COMFY_INPUT_DIR}"; then
+        echo "worker-comfyui - Could not create ${COMFY_INPUT_DIR}, using /comfyui/input" >&2
+        COMFY_INPUT_DIR=/comfyui/input
+    else
+        free_mb="$(df -Pm "${COMFY_INPUT_DIR}" | awk 'NR==2 {print $4}')"
+        if [ -z "${free_mb}" ] || [ "${free_mb}" -lt "${COMFY_INPUT_MIN_FREE_MB}" ]; then
+            echo "worker-comfyui - Only ${free_mb:-unknown} MB free in ${COMFY_INPUT_DIR} (need ${COMFY_INPUT_MIN_FREE_MB} MB), using /comfyui/input" >&2
+            COMFY_INPUT_DIR=/comfyui/input
+        # Seed with the static input files baked into the image (without overwriting)
+        elif ! cp -an /comfyui/input/. "${COMFY_INPUT_DIR}/"; then
+            echo "worker-comfyui - Could not copy static inputs to ${COMFY_INPUT_DIR}, using /comfyui/input" >&2
+            COMFY_INPUT_DIR=/comfyui/input
+        fi
+    fi
+fi
+export COMFY_INPUT_DIR
+
 # Serve the API and don't shutdown the container
 if [ "$SERVE_API_LOCALLY" == "true" ]; then
-    python -u /comfyui/main.py --disable-auto-launch --disable-metadata --listen --verbose "${COMFY_LOG_LEVEL}" --log-stdout &
+    python -u /comfyui/main.py --disable-auto-launch --disable-metadata --listen --verbose "${COMFY_LOG_LEVEL}" --log-stdout --input-directory "${COMFY_INPUT_DIR}" &
 
     echo "worker-comfyui: Starting RunPod Handler"
     python -u /handler.py --rp_serve_api --rp_api_host=0.0.0.0
 else
-    python -u /comfyui/main.py --disable-auto-launch --disable-metadata --verbose "${COMFY_LOG_LEVEL}" --log-stdout &
+    python -u /comfyui/main.py --disable-auto-launch --disable-metadata --verbose "${COMFY_LOG_LEVEL}" --log-stdout --input-directory "${COMFY_INPUT_DIR}" &
 
     echo "worker-comfyui: Starting RunPod Handler"
     python -u /handler.py
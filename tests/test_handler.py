@@ -4,10 +4,12 @@ import sys
 import os
 import json
 import base64
+import time
+from io import BytesIO
 
-# Make sure that "src" is known and can be used to import handler.py
-sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "src")))
-from src import handler
+# Make sure that the repository root is known and can be used to import handler.py
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+import handler
 
 # Local folder for test resources
 RUNPOD_WORKER_COMFY_TEST_RESOURCES_IMAGES = "./test_resources/images"
@@ -64,7 +66,7 @@ class TestRunpodWorkerComfy(unittest.TestCase):
         self.assertIsNotNone(error)
         self.assertEqual(error, "Please provide input")
 
-    @patch("handler.requests.get")
+    @patch("handler.comfy_session.get")
     def test_check_server_server_up(self, mock_requests):
         mock_response = MagicMock()
         mock_response.status_code = 200
@@ -73,7 +75,7 @@ class TestRunpodWorkerComfy(unittest.TestCase):
         result = handler.check_server("http://127.0.0.1:8188", 1, 50)
         self.assertTrue(result)
 
-    @patch("handler.requests.get")
+    @patch("handler.comfy_session.get")
     def test_check_server_server_down(self, mock_requests):
         mock_requests.get.side_effect = handler.requests.RequestException()
         result = handler.check_server("http://127.0.0.1:8188", 1, 50)
@@ -205,7 +207,7 @@ class TestRunpodWorkerComfy(unittest.TestCase):
         self.assertIn("simulated_uploaded", result["message"])
         self.assertEqual(result["status"], "success")
 
-    @patch("handler.requests.post")
+    @patch("handler.comfy_session.post")
     def test_upload_images_successful(self, mock_post):
         mock_response = unittest.mock.Mock()
         mock_response.status_code = 200
@@ -221,7 +223,7 @@ class TestRunpodWorkerComfy(unittest.TestCase):
         self.assertEqual(len(responses), 3)
         self.assertEqual(responses["status"], "success")
 
-    @patch("handler.requests.post")
+    @patch("handler.comfy_session.post")
     def test_upload_images_failed(self, mock_post):
         mock_response = unittest.mock.Mock()
         mock_response.status_code = 400
@@ -236,3 +238,385 @@ class TestRunpodWorkerComfy(unittest.TestCase):
 
         self.assertEqual(len(responses), 3)
         self.assertEqual(responses["status"], "error")
+
+    @patch("handler.get_history")
+    def test_poll_history_for_completion_success(self, mock_get_history):
+        mock_get_history.return_value = {
+            "123": {"status": {"status_str": "success", "completed": True}}
+        }
+
+        errors = handler._poll_history_for_completion("123", 5)
+
+        self.assertEqual(errors, [])
+
+    @patch("handler.time.sleep")
+    @patch("handler.get_history")
+    def test_poll_history_for_completion_backs_off(self, mock_get_history, mock_sleep):
+        finished = {"123": {"status": {"status_str": "success", "completed": True}}}
+        mock_get_history.side_effect = [{}] * 20 + [finished]
+
+        errors = handler._poll_history_for_completion("123", 5)
+
+        self.assertEqual(errors, [])
+        delays = [call.args[0] for call in mock_sleep.call_args_list]
+        self.assertEqual(delays[0], handler.COMFY_POLLING_INITIAL_INTERVAL_MS / 1000)
+        self.assertEqual(delays, sorted(delays))
+        self.assertEqual(delays[-1], handler.COMFY_POLLING_MAX_INTERVAL_MS / 1000)
+
+    @patch("handler._comfy_server_status", return_value={"reachable": False})
+    @patch("handler.get_history")
+    def test_poll_history_for_completion_aborts_when_comfy_is_down(
+        self, mock_get_history, mock_server_status
+    ):
+        mock_get_history.side_effect = handler.requests.ConnectionError("refused")
+
+        with self.assertRaises(handler.websocket.WebSocketConnectionClosedException):
+            handler._poll_history_for_completion("123", 5)
+
+        mock_get_history.assert_called_once_with("123")
+
+    @patch("handler.get_history")
+    def test_poll_history_for_completion_execution_error(self, mock_get_history):
+        mock_get_history.return_value = {
+            "123": {
+                "status": {
+                    "status_str": "error",
+                    "completed": False,
+                    "messages": [
+                        ["execution_start", {"prompt_id": "123"}],
+                        [
+                            "execution_error",
+                            {
+                                "prompt_id": "123",
+                                "node_id": "8",
+                                "node_type": "VAEDecode",
+                                "exception_message": "out of memory",
+                            },
+                        ],
+                    ],
+                }
+            }
+        }
+
+        errors = handler._poll_history_for_completion("123", 5)
+
+        self.assertEqual(len(errors), 1)
+        self.assertIn("out of memory", errors[0])
+
+    @patch("builtins.open", new_callable=mock_open)
+    @patch("handler.os.makedirs")
+    @patch("handler._get_s3_client")
+    def test_upload_to_s3_without_credentials_simulates_upload(
+        self, mock_get_s3_client, mock_makedirs, mock_file
+    ):
+        mock_get_s3_client.return_value = None
+
+        result = handler.upload_to_s3("123", BytesIO(b"Test Image Data"), ".png")
+
+        self.assertTrue(result.startswith("simulated_uploaded/"))
+        self.assertTrue(result.endswith(".png"))
+        mock_makedirs.assert_called_once_with("simulated_uploaded", exist_ok=True)
+        mock_file.assert_called_with(result, "wb")
+        mock_file().write.assert_called_with(b"Test Image Data")
+
+    @patch("handler.os.path.exists")
+    def test_find_new_input_images_skips_existing_files(self, mock_exists):
+        static_path = os.path.join(handler.COMFY_INPUT_DIR, "static.png")
+        mock_exists.side_effect = lambda path: path == static_path
+        images = [
+            {"name": "static.png", "image": ""},
+            {"name": "upload.png", "image": ""},
+        ]
+
+        paths = handler.find_new_input_images(images)
+
+        self.assertEqual(paths, [os.path.join(handler.COMFY_INPUT_DIR, "upload.png")])
+
+    @patch("handler.os.remove")
+    def test_remove_input_images_ignores_missing_files(self, mock_remove):
+        mock_remove.side_effect = [FileNotFoundError, None]
+
+        handler.remove_input_images(["/tmp/a.png", "/tmp/b.png"])
+
+        mock_remove.assert_called_with("/tmp/b.png")
+        self.assertEqual(mock_remove.call_count, 2)
+
+    @patch.dict(os.environ, {"BUCKET_ENDPOINT_URL": "http://example.com"})
+    @patch("handler.os.path.isfile", return_value=True)
+    @patch("handler.open_image_stream")
+    @patch("handler.upload_to_s3")
+    def test_process_output_image_uploads_from_disk(
+        self, mock_upload_to_s3, mock_open_image_stream, mock_isfile
+    ):
+        mock_upload_to_s3.return_value = "http://example.com/clip.mp4"
+        image_info = {"filename": "clip.mp4", "subfolder": "video", "type": "output"}
+
+        entry, error = handler.process_output_image("123", image_info)
+
+        self.assertIsNone(error)
+        self.assertEqual(entry["data"], "http://example.com/clip.mp4")
+        mock_upload_to_s3.assert_called_once_with(
+            "123", os.path.join(handler.COMFY_OUTPUT_DIR, "video", "clip.mp4"), ".mp4"
+        )
+        mock_open_image_stream.assert_not_called()
+
+    @patch("handler.time.strftime", return_value="01-26")
+    @patch("handler._get_s3_client")
+    def test_upload_to_s3_uploads_local_files_by_path(
+        self, mock_get_s3_client, mock_strftime
+    ):
+        s3_client = mock_get_s3_client.return_value
+        s3_client.generate_presigned_url.return_value = "http://example.com/clip.mp4"
+
+        result = handler.upload_to_s3("123", "/comfyui/output/clip.mp4", ".mp4")
+
+        self.assertEqual(result, "http://example.com/clip.mp4")
+        s3_client.upload_file.assert_called_once()
+        args, kwargs = s3_client.upload_file.call_args
+        self.assertEqual(args[:2], ("/comfyui/output/clip.mp4", "01-26"))
+        self.assertEqual(kwargs["ExtraArgs"], {"ContentType": "video/mp4"})
+        s3_client.upload_fileobj.assert_not_called()
+
+    @patch("handler.COMFY_WORKFLOWS_DIR", "./test_resources/workflows")
+    def test_load_workflow_returns_independent_copies(self):
+        handler.get_workflow_names.cache_clear()
+        handler._read_workflow.cache_clear()
+        self.addCleanup(handler.get_workflow_names.cache_clear)
+        self.addCleanup(handler._read_workflow.cache_clear)
+
+        first = handler.load_workflow("t2v")
+        first["89"]["inputs"]["text"] = "changed"
+        second = handler.load_workflow("t2v")
+
+        self.assertEqual(second["89"]["class_type"], "CLIPTextEncode")
+        self.assertNotEqual(second["89"]["inputs"]["text"], "changed")
+
+    @patch("handler.COMFY_WORKFLOWS_DIR", "./test_resources/workflows")
+    def test_input_with_unknown_workflow_name(self):
+        handler.get_workflow_names.cache_clear()
+        self.addCleanup(handler.get_workflow_names.cache_clear)
+
+        validated_data, error = handler.validate_input({"workflow": "unknown"})
+
+        self.assertIsNone(validated_data)
+        self.assertEqual(
+            error,
+            "Unknown workflow 'unknown'. Available workflows: fun_camera, i2v, t2v, vace",
+        )
+
+    @patch("handler.comfy_session.get")
+    def test_get_image_base64_streams_unaligned_chunks(self, mock_get):
+        mock_response = MagicMock()
+        mock_response.iter_content.return_value = [b"Te", b"st Im", b"age Data"]
+        mock_get.return_value.__enter__.return_value = mock_response
+
+        result = handler.get_image_base64("test.png", "", "output")
+
+        self.assertEqual(result, base64.b64encode(b"Test Image Data").decode("utf-8"))
+
+    @patch.dict(
+        os.environ,
+        {
+            "BUCKET_ENDPOINT_URL": "http://example.com",
+            "BUCKET_ACCESS_KEY_ID": "",
+            "BUCKET_SECRET_ACCESS_KEY": "",
+        },
+    )
+    def test_get_s3_client_without_credentials(self):
+        self.assertIsNone(handler._get_s3_client())
+
+    def test_valid_input_with_invalid_params(self):
+        input_data = {"workflow": {"key": "value"}, "params": "a prompt"}
+        validated_data, error = handler.validate_input(input_data)
+        self.assertIsNone(validated_data)
+        self.assertEqual(error, "'params' must be an object")
+
+    def test_valid_input_with_unknown_params(self):
+        input_data = {"workflow": {"key": "value"}, "params": {"seed": "42"}}
+        validated_data, error = handler.validate_input(input_data)
+        self.assertIsNone(validated_data)
+        self.assertEqual(
+            error,
+            "Unknown params: seed. Supported params: image, negative_prompt, positive_prompt, prompt",
+        )
+
+    def test_valid_input_with_non_string_params(self):
+        input_data = {"workflow": {"key": "value"}, "params": {"prompt": 42}}
+        validated_data, error = handler.validate_input(input_data)
+        self.assertIsNone(validated_data)
+        self.assertEqual(error, "'params' values must be strings")
+
+    def test_workflow_updater_rejects_params_without_node(self):
+        workflow = {"1": {"class_type": "CLIPTextEncode", "inputs": {"text": "old"}}}
+        update = handler.make_workflow_updater(handler.index_workflow(workflow))
+
+        with self.assertRaises(ValueError):
+            update(workflow, {"image": "new.png"})
+
+        self.assertEqual(workflow["1"]["inputs"]["text"], "old")
+
+    def test_workflow_updater_applies_params(self):
+        workflow = {
+            "1": {"class_type": "CLIPTextEncode", "inputs": {"text": "old positive"}},
+            "2": {"class_type": "CLIPTextEncode", "inputs": {"text": "old negative"}},
+            "3": {
+                "class_type": "KSampler",
+                "inputs": {"positive": ["1", 0], "negative": ["2", 0]},
+            },
+            "4": {"class_type": "LoadImage", "inputs": {"image": "old.png"}},
+        }
+        update = handler.make_workflow_updater(handler.index_workflow(workflow))
+
+        update(workflow, {"prompt": "a ball on the table", "image": "new.png"})
+
+        self.assertEqual(workflow["1"]["inputs"]["text"], "a ball on the table")
+        self.assertEqual(workflow["2"]["inputs"]["text"], "old negative")
+        self.assertEqual(workflow["4"]["inputs"]["image"], "new.png")
+
+    @patch("handler.queue_workflow")
+    @patch("handler.websocket.WebSocket")
+    @patch("handler._comfy_recently_reachable", return_value=True)
+    def test_handler_with_params_and_malformed_workflow_returns_error(
+        self, mock_reachable, mock_websocket, mock_queue_workflow
+    ):
+        mock_queue_workflow.side_effect = ValueError("Workflow validation failed")
+        params = {"prompt": "x", "image": "a.png"}
+        malformed_workflows = [
+            {"key": "value"},
+            {"nodes": [{"id": 1}], "links": []},
+            {"4": {"class_type": "LoadImage"}},
+            {"4": {"class_type": "LoadImage", "inputs": "a.png"}},
+        ]
+
+        for workflow in malformed_workflows:
+            result = handler.handler(
+                {"id": "123", "input": {"workflow": workflow, "params": params}}
+            )
+            # Either the params can't be applied or ComfyUI rejects the workflow
+            self.assertEqual(list(result), ["error"])
+            self.assertNotIn("unexpected error", result["error"])
+
+    def test_wait_for_completion_reports_outputs_while_executing(self):
+        node_output = {"images": [{"filename": "a.png", "type": "output"}]}
+        mock_ws = MagicMock()
+        mock_ws.recv.side_effect = [
+            json.dumps(
+                {
+                    "type": "executed",
+                    "data": {"node": "9", "output": node_output, "prompt_id": "123"},
+                }
+            ),
+            json.dumps(
+                {"type": "executing", "data": {"node": None, "prompt_id": "123"}}
+            ),
+        ]
+        on_output = MagicMock()
+
+        ws, errors = handler.wait_for_completion(
+            mock_ws, "ws://127.0.0.1:8188/ws", "123", on_output=on_output
+        )
+
+        self.assertIs(ws, mock_ws)
+        self.assertEqual(errors, [])
+        on_output.assert_called_once_with("9", node_output)
+
+    @patch("handler.get_history")
+    @patch("handler._attempt_websocket_reconnect")
+    def test_wait_for_completion_checks_history_after_reconnect(
+        self, mock_reconnect, mock_get_history
+    ):
+        mock_ws = MagicMock()
+        mock_ws.recv.side_effect = handler.websocket.WebSocketConnectionClosedException()
+        new_ws = MagicMock()
+        mock_reconnect.return_value = new_ws
+        mock_get_history.return_value = {
+            "123": {"status": {"status_str": "success", "completed": True}}
+        }
+
+        ws, errors = handler.wait_for_completion(
+            mock_ws, "ws://127.0.0.1:8188/ws", "123"
+        )
+
+        self.assertIs(ws, new_ws)
+        self.assertEqual(errors, [])
+        new_ws.recv.assert_not_called()
+
+    @patch("handler.COMFY_POLLING_TIMEOUT_S", 10)
+    @patch("handler.time.monotonic")
+    def test_wait_for_completion_times_out(self, mock_monotonic):
+        mock_monotonic.side_effect = [0, 5, 11]
+        mock_ws = MagicMock()
+        mock_ws.recv.side_effect = handler.websocket.WebSocketTimeoutException()
+
+        with self.assertRaises(ValueError):
+            handler.wait_for_completion(mock_ws, "ws://127.0.0.1:8188/ws", "123")
+
+        self.assertEqual(mock_ws.recv.call_count, 1)
+
+    @patch("handler.websocket.WebSocket")
+    @patch("handler.check_server")
+    @patch("handler._comfy_recently_reachable", return_value=True)
+    def test_handler_skips_server_check_on_warm_worker(
+        self, mock_reachable, mock_check_server, mock_websocket
+    ):
+        mock_websocket.return_value.connect.side_effect = (
+            handler.websocket.WebSocketException("closed")
+        )
+
+        result = handler.handler({"id": "123", "input": {"workflow": {"1": {}}}})
+
+        mock_check_server.assert_not_called()
+        self.assertEqual(result, {"error": "WebSocket communication error: closed"})
+
+    @patch("handler.websocket.WebSocket")
+    @patch("handler.check_server", return_value=False)
+    @patch("handler._comfy_recently_reachable", return_value=False)
+    def test_handler_checks_server_on_cold_worker(
+        self, mock_reachable, mock_check_server, mock_websocket
+    ):
+        result = handler.handler({"id": "123", "input": {"workflow": {"1": {}}}})
+
+        mock_check_server.assert_called_once()
+        mock_websocket.assert_not_called()
+        self.assertIn("not reachable", result["error"])
+
+    @patch("handler.comfy_session.post")
+    def test_upload_images_keeps_order_when_uploads_finish_out_of_order(
+        self, mock_post
+    ):
+        delays = {"a.png": 0.06, "b.png": 0.03, "c.png": 0.0}
+
+        def post(url, files, timeout):
+            time.sleep(delays[files["image"][0]])
+            return MagicMock()
+
+        mock_post.side_effect = post
+        test_image_data = base64.b64encode(b"Test Image Data").decode("utf-8")
+        images = [{"name": name, "image": test_image_data} for name in delays]
+
+        responses = handler.upload_images(images)
+
+        self.assertEqual(responses["status"], "success")
+        self.assertEqual(
+            responses["details"],
+            [f"Successfully uploaded {name}" for name in delays],
+        )
+
+    @patch.dict(os.environ, {"BUCKET_ENDPOINT_URL": "http://example.com"})
+    @patch("handler.os.path.isfile", return_value=False)
+    @patch("handler.open_image_stream")
+    @patch("handler.upload_to_s3")
+    def test_process_output_image_streams_from_view_without_local_file(
+        self, mock_upload_to_s3, mock_open_image_stream, mock_isfile
+    ):
+        mock_upload_to_s3.return_value = "http://example.com/image.png"
+        response = mock_open_image_stream.return_value
+        image_info = {"filename": "image.png", "subfolder": "", "type": "output"}
+
+        entry, error = handler.process_output_image("123", image_info)
+
+        self.assertIsNone(error)
+        self.assertEqual(entry["data"], "http://example.com/image.png")
+        mock_open_image_stream.assert_called_once_with("image.png", "", "output")
+        mock_upload_to_s3.assert_called_once_with("123", response.raw, ".png")
+        response.close.assert_called_once()